@@ -1,7 +1,30 @@
 """Basic DSPy examples showing the move from prompts to modules."""
 
+import asyncio
+import textwrap
 import dspy
 
+try:
+    from src.config import configure_llm
+except ImportError:  # Run as a script from inside src/
+    from config import configure_llm
+
+_QUESTIONS = (
+    "What is DSPy?",
+    "What are the benefits of modular AI programming?",
+    "How does DSPy differ from prompt engineering?",
+)
+
+_SAMPLE_TEXT = textwrap.dedent(
+    """
+    DSPy is a framework for programming language models that brings software 
+    engineering best practices to AI development. Instead of writing fragile 
+    prompts, developers define modules with clear inputs and outputs. DSPy 
+    automatically generates and optimizes the prompts behind the scenes, 
+    making AI systems more reliable and maintainable.
+    """
+).strip()
+
 
 def demonstrate_fragile_prompts():
     """Show how small prompt changes can cause different behaviors."""
@@ -47,43 +70,36 @@ class Summarize(dspy.Module):
         return result.summary
 
 
-def demonstrate_basic_qa():
+async def demonstrate_basic_qa():
     """Demonstrate basic DSPy modules for Q&A and summarization."""
     print("DSPy Solution: Modular, Code-Driven AI")
     print("-" * 50)
 
     # Question Answering
-    qa = SimpleQA()
-    questions = [
-        "What is DSPy?",
-        "What are the benefits of modular AI programming?",
-        "How does DSPy differ from prompt engineering?",
-    ]
+    # asyncify runs the sync module in a worker thread so the questions
+    # are answered concurrently instead of one round-trip after another
+    aqa = dspy.asyncify(SimpleQA())
+    questions = _QUESTIONS
 
     print("Question Answering Module:")
-    for question in questions:
-        try:
-            answer = qa(question)
+    answers = await asyncio.gather(
+        *(aqa(question=question) for question in questions),
+        return_exceptions=True,  # Handle partial failures gracefully
+    )
+    for question, answer in zip(questions, answers):
+        if isinstance(answer, Exception):
+            print(f"\nError answering '{question}': {answer}")
+        else:
             print(f"\nQ: {question}")
             print(f"A: {answer}")
-        except Exception as e:
-            print(f"\nError answering '{question}': {e}")
 
     # Summarization
     print("\n\nSummarization Module:")
-    summarizer = Summarize()
-
-    sample_text = """
-    DSPy is a framework for programming language models that brings software 
-    engineering best practices to AI development. Instead of writing fragile 
-    prompts, developers define modules with clear inputs and outputs. DSPy 
-    automatically generates and optimizes the prompts behind the scenes, 
-    making AI systems more reliable and maintainable.
-    """
+    asummarize = dspy.asyncify(Summarize())
 
     try:
-        summary = summarizer(sample_text)
-        print(f"\nOriginal text: {sample_text.strip()}")
+        summary = await asummarize(document=_SAMPLE_TEXT)
+        print(f"\nOriginal text: {_SAMPLE_TEXT}")
         print(f"\nSummary: {summary}")
     except Exception as e:
         print(f"Error summarizing: {e}")
@@ -92,11 +108,9 @@ def demonstrate_basic_qa():
 
 
 if __name__ == "__main__":
-    from config import configure_llm
-    
     # Configure LLM
     configure_llm()
     
     # Run demonstrations
     demonstrate_fragile_prompts()
-    demonstrate_basic_qa()
+    asyncio.run(demonstrate_basic_qa())
@@ -1,16 +1,46 @@
 """Configuration for LLM providers - supports OpenAI, Anthropic, and Ollama."""
 
+import functools
 import os
+from pathlib import Path
 from typing import Optional
 from dotenv import load_dotenv
 import dspy
 
-# Load environment variables
-load_dotenv()
+# Worker threads for dspy.asyncify(), which demonstrate_basic_qa() uses to run
+# sync modules concurrently; native .acall()s do not go through this limit
+ASYNC_MAX_WORKERS = 16
 
+# Default on-disk cache for LLM responses, anchored to the project root so every
+# entry point shares it regardless of the working directory
+DEFAULT_LLM_CACHE_DIR = Path(__file__).resolve().parent.parent / ".llm_cache"
 
+
+def _env_flag(name: str, default: bool) -> bool:
+    """Read a boolean environment variable such as true/false, 1/0, or yes/no."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+@functools.lru_cache(maxsize=1)
 def configure_llm() -> Optional[dspy.LM]:
-    """Configure the LLM based on environment variables."""
+    """Configure the LLM based on environment variables.
+
+    The result is cached: repeated calls reuse the same dspy.LM instance (and its
+    connection pool) instead of re-reading .env and building a new client.
+    """
+    # Load environment variables
+    load_dotenv()
+
+    # Keep DSPy's on-disk response cache in the project rather than ~/.dspy_cache
+    dspy.configure_cache(
+        enable_disk_cache=True,
+        enable_memory_cache=True,
+        disk_cache_dir=os.getenv("LLM_CACHE_DIR", str(DEFAULT_LLM_CACHE_DIR)),
+    )
+
     provider = os.getenv("LLM_PROVIDER", "openai").lower()
     llm: Optional[dspy.LM] = None
 
@@ -33,6 +63,8 @@ def configure_llm() -> Optional[dspy.LM]:
     elif provider == "ollama":
         base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
         model = os.getenv("OLLAMA_MODEL", "phi3:latest")
+        # No custom HTTP client needed: litellm caches one pooled async client per
+        # provider, so gathered .acall()s already reuse keep-alive connections
         llm = dspy.LM(
             model=f"ollama_chat/{model}",
             base_url=base_url,
@@ -44,7 +76,17 @@ def configure_llm() -> Optional[dspy.LM]:
         raise ValueError(f"Unknown LLM provider: {provider}")
 
     # Configure DSPy with the selected LLM
-    dspy.settings.configure(lm=llm)
+    dspy.settings.configure(lm=llm, async_max_workers=ASYNC_MAX_WORKERS)
     print(f"✓ Configured DSPy with {provider} provider using {model} model")
 
+    # Load the local model here rather than on the first real call, where it
+    # would stall every coroutine of the first asyncio.gather(). The response
+    # cache is bypassed, or later runs would answer this from disk. Off by
+    # default for cloud providers: there is no model to load, only a billed call
+    if _env_flag("LLM_WARMUP", default=provider == "ollama"):
+        try:
+            dspy.Predict("x -> y")(x="warmup", config={"cache": False})
+        except Exception as e:
+            print(f"LLM warmup call failed (continuing): {e}")
+
     return llm
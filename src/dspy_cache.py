@@ -0,0 +1,211 @@
+"""In-process caching for DSPy predictor calls.
+
+DSPy's LM cache still formats the prompt and parses the completion on every
+hit. ResponseCache sits in front of a predictor and returns the finished
+Prediction for inputs it has already seen. coalesced_call() makes concurrent
+identical requests on the same event loop, from any module instance, share a
+single LLM call. An optional SemanticCache lets near-duplicate inputs skip the
+LLM entirely.
+"""
+
+import asyncio
+import functools
+import hashlib
+import json
+import threading
+import unicodedata
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Protocol
+
+import dspy
+
+
+def _normalize(value: Any) -> Any:
+    """Normalize string inputs so trivially different copies share a key."""
+    if isinstance(value, str):
+        return unicodedata.normalize("NFC", value).strip()
+    return value
+
+
+def _lm_identity(predict: dspy.Predict) -> Optional[Dict[str, Any]]:
+    """Describe the LM that would answer this predictor in the current context."""
+    lm = getattr(predict, "lm", None) or dspy.settings.lm
+    if lm is None:
+        return None
+    return {"model": lm.model, "kwargs": lm.kwargs}
+
+
+def _prompt_setup(predict: dspy.Predict) -> Dict[str, Any]:
+    """Everything besides the inputs that shapes a predictor's answer."""
+    return {
+        "lm": _lm_identity(predict),
+        "signature": predict.signature.signature,
+        "instructions": predict.signature.instructions,
+        "demos": predict.demos,
+    }
+
+
+def _hash(payload: Dict[str, Any]) -> str:
+    """SHA-256 of a JSON payload with sorted keys."""
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def make_key(predict: dspy.Predict, **kwargs: Any) -> str:
+    """Build a stable SHA-256 key from the LM, a predictor's prompt setup, and its inputs."""
+    payload = _prompt_setup(predict)
+    payload["inputs"] = {name: _normalize(value) for name, value in kwargs.items()}
+    return _hash(payload)
+
+
+def make_scope(predict: dspy.Predict) -> str:
+    """Build a SHA-256 key from the LM and a predictor's prompt setup, without inputs.
+
+    SemanticCache entries are only comparable within one scope.
+    """
+    return _hash(_prompt_setup(predict))
+
+
+def _record_trace(predict: dspy.Predict, inputs: Dict[str, Any], result: dspy.Prediction) -> None:
+    """Add a trace entry for a result served without calling the predictor.
+
+    Mirrors what Predict records on a real call, so optimizers that bootstrap
+    demos from dspy.settings.trace still see cached steps.
+    """
+    trace = dspy.settings.trace
+    if trace is None or dspy.settings.max_trace_size <= 0:
+        return
+    if len(trace) >= dspy.settings.max_trace_size:
+        trace.pop(0)
+    trace.append((predict, dict(inputs), result))
+
+
+# Requests currently awaiting the LLM, shared across every cache and module.
+# Tasks belong to one event loop, so each running loop gets its own map.
+_Requests = Dict[str, "asyncio.Task[dspy.Prediction]"]
+_INFLIGHT: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _Requests]" = (
+    weakref.WeakKeyDictionary()
+)
+_INFLIGHT_LOCK = threading.Lock()
+
+
+def _inflight_requests() -> _Requests:
+    """Return the in-flight request map for the running event loop."""
+    loop = asyncio.get_running_loop()
+    with _INFLIGHT_LOCK:
+        requests = _INFLIGHT.get(loop)
+        if requests is None:
+            requests = _INFLIGHT[loop] = {}
+    return requests
+
+
+def _finish_inflight(
+    requests: _Requests, key: str, task: "asyncio.Task[dspy.Prediction]"
+) -> None:
+    """Drop a finished request from its loop's in-flight map."""
+    if requests.get(key) is task:
+        del requests[key]
+    if not task.cancelled():
+        task.exception()  # Mark retrieved in case every caller was cancelled
+
+
+async def coalesced_call(
+    predict: dspy.Predict, key: str, **kwargs: Any
+) -> dspy.Prediction:
+    """Call predict.acall(**kwargs), sharing one request among identical callers.
+
+    The request runs as its own task. Every caller, including the one that
+    started it, awaits it through asyncio.shield(), so cancelling any caller
+    never cancels the request the others are waiting on.
+    """
+    requests = _inflight_requests()
+    task = requests.get(key)
+    if task is None:
+        task = asyncio.create_task(predict.acall(**kwargs))
+        requests[key] = task
+        task.add_done_callback(functools.partial(_finish_inflight, requests, key))
+        return await asyncio.shield(task)
+
+    result = await asyncio.shield(task)
+    # The predictor traced the call for the caller that started it
+    _record_trace(predict, kwargs, result)
+    return result
+
+
+class ResponseCache:
+    """Exact-match LRU cache of predictor results, keyed on normalized inputs."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._results: "OrderedDict[str, dspy.Prediction]" = OrderedDict()
+
+    async def acall(
+        self,
+        predict: dspy.Predict,
+        *,
+        semantic_cache: Optional["SemanticCache"] = None,
+        **kwargs: Any,
+    ) -> dspy.Prediction:
+        """Return the cached prediction for these inputs, calling the LLM on a miss.
+
+        For a single text input, semantic_cache (when given) is consulted after
+        an exact miss and updated after an LLM call.
+        """
+        key = make_key(predict, **kwargs)
+        result = self._results.get(key)
+        if result is not None:
+            self._results.move_to_end(key)
+            _record_trace(predict, kwargs, result)
+            return result
+
+        text = _single_text_input(kwargs) if semantic_cache is not None else None
+        if text is not None:
+            scope = make_scope(predict)
+            result = await semantic_cache.lookup(text, scope)
+            if result is not None:
+                _record_trace(predict, kwargs, result)
+                return result
+
+        result = await coalesced_call(predict, key, **kwargs)
+        self._store(key, result)
+        if text is not None:
+            await semantic_cache.store(text, scope, result)
+        return result
+
+    def _store(self, key: str, result: dspy.Prediction) -> None:
+        """Insert a result, evicting the least recently used entry when full."""
+        self._results[key] = result
+        if len(self._results) > self.maxsize:
+            self._results.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop all cached results."""
+        self._results.clear()
+
+
+class SemanticCache(Protocol):
+    """Similarity-based cache for near-duplicate inputs.
+
+    Implementations typically embed the text (e.g. with a sentence-transformers
+    model), search a vector store, and return a stored prediction when the best
+    match is close enough. Only entries stored under the same scope may match:
+    the scope identifies the LM and prompt setup that produced them. Blocking
+    work should run via asyncio.to_thread().
+    """
+
+    async def lookup(self, text: str, scope: str) -> Optional[dspy.Prediction]:
+        """Return the prediction stored for a similar input in this scope, or None."""
+        ...
+
+    async def store(self, text: str, scope: str, prediction: dspy.Prediction) -> None:
+        """Remember the prediction produced for an input in this scope."""
+        ...
+
+
+def _single_text_input(inputs: Dict[str, Any]) -> Optional[str]:
+    """Return the input text if the call has exactly one string input."""
+    if len(inputs) != 1:
+        return None
+    (value,) = inputs.values()
+    return value if isinstance(value, str) else None
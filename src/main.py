@@ -8,11 +8,17 @@ from src.pipelines import demonstrate_pipeline
 from src.optimization import demonstrate_optimization
 
 
+# Header rules, built once instead of on every print_header() call
+_HEADER_WIDTH = 70
+_RULE_ABOVE = "\n" + "=" * _HEADER_WIDTH
+_RULE_BELOW = "=" * _HEADER_WIDTH + "\n"
+
+
 def print_header(title: str):
     """Print a formatted section header."""
-    print("\n" + "=" * 70)
-    print(f"{title:^70}")
-    print("=" * 70 + "\n")
+    print(_RULE_ABOVE)
+    print(f"{title:^{_HEADER_WIDTH}}")
+    print(_RULE_BELOW)
 
 
 async def main():
@@ -29,7 +35,7 @@ async def main():
 
     # Show basic DSPy modules
     print_header("The Solution: DSPy Modules")
-    demonstrate_basic_qa()
+    await demonstrate_basic_qa()
 
     # Demonstrate structured outputs with async
     print_header("Modern DSPy: Async & Structured Outputs")
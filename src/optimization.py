@@ -1,7 +1,97 @@
 """Self-improving modules with DSPy optimization."""
 
+import hashlib
+import inspect
+import json
+import os
+from pathlib import Path
 import dspy
 
+try:
+    from src.config import configure_llm
+except ImportError:  # Run as a script from inside src/
+    from config import configure_llm
+
+# Word-count bounds for answer_quality_metric
+MIN_ANSWER_WORDS = 5
+MAX_ANSWER_WORDS = 50
+
+# Where compiled programs are saved by load_or_compile(), under the project root
+PROGRAM_CACHE_DIR = str(Path(__file__).resolve().parent.parent / "cache")
+
+
+def answer_quality_metric(example, prediction, trace=None):
+    """Evaluate answer quality based on length and relevance."""
+    # Simple metric: answer should be concise but complete
+    answer = getattr(prediction, "answer", None)
+    if answer is None:
+        answer = str(prediction)
+
+    # Check length (not too short, not too long). Only the thresholds matter,
+    # so stop splitting once the answer is known to be too long.
+    word_count = len(answer.split(maxsplit=MAX_ANSWER_WORDS))
+    if word_count < MIN_ANSWER_WORDS:
+        return 0.0
+    elif word_count > MAX_ANSWER_WORDS:
+        return 0.5
+    else:
+        return 1.0
+
+
+def _program_cache_key(optimizer, student: dspy.Module, trainset) -> str:
+    """Hash everything that determines the outcome of a compile."""
+    metric = getattr(optimizer, "metric", None)
+    try:
+        metric_source = inspect.getsource(metric)
+    except (OSError, TypeError):
+        metric_source = getattr(metric, "__qualname__", repr(metric))
+
+    # Constructor arguments such as max_bootstrapped_demos, read back from the
+    # attributes optimizers store them under
+    hyperparameters = {
+        name: getattr(optimizer, name)
+        for name in inspect.signature(type(optimizer).__init__).parameters
+        if name not in ("self", "metric") and hasattr(optimizer, name)
+    }
+    lm = dspy.settings.lm
+
+    payload = {
+        "optimizer": type(optimizer).__name__,
+        "hyperparameters": hyperparameters,
+        "lm": {"model": lm.model, "kwargs": lm.kwargs} if lm is not None else None,
+        "metric": metric_source,
+        "signatures": [
+            [name, predictor.signature.signature, predictor.signature.instructions]
+            for name, predictor in student.named_predictors()
+        ],
+        "trainset": [example.toDict() for example in trainset],
+    }
+    encoded = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def load_or_compile(
+    optimizer, student: dspy.Module, trainset, cache_dir: str = PROGRAM_CACHE_DIR
+) -> dspy.Module:
+    """Compile a module, reusing a previously saved result when one exists.
+
+    Compiling bootstraps demos with many LLM calls. The compiled program is saved
+    under a hash of the optimizer and its settings, the LM, the metric, signatures,
+    and training data, so later runs with the same inputs load it from disk
+    instead of recompiling.
+    """
+    key = _program_cache_key(optimizer, student, trainset)
+    path = os.path.join(cache_dir, f"{type(student).__name__}-{key}.json")
+
+    if os.path.exists(path):
+        student.load(path)
+        return student
+
+    compiled = optimizer.compile(student=student, trainset=trainset)
+    os.makedirs(cache_dir, exist_ok=True)
+    compiled.save(path)
+    return compiled
+
 
 def demonstrate_optimization():
     """Show how DSPy can optimize modules with feedback."""
@@ -24,21 +114,6 @@ def demonstrate_optimization():
         ),
     ]
 
-    # Metric function for optimization
-    def answer_quality_metric(example, prediction, trace=None):
-        """Evaluate answer quality based on length and relevance."""
-        # Simple metric: answer should be concise but complete
-        answer = prediction.answer if hasattr(prediction, "answer") else str(prediction)
-
-        # Check length (not too short, not too long)
-        word_count = len(answer.split())
-        if word_count < 5:
-            return 0.0
-        elif word_count > 50:
-            return 0.5
-        else:
-            return 1.0
-
     print("\n1. Optimization Process:")
     print("   - Define training examples with expected outputs")
     print("   - Create evaluation metrics")
@@ -82,8 +157,9 @@ def demonstrate_optimization():
     # Create optimizer
     optimizer = BootstrapFewShot(metric=answer_quality_metric)
     
-    # Compile module with training data
-    optimized_qa = optimizer.compile(
+    # Compile module with training data (saved to disk and reused next run)
+    optimized_qa = load_or_compile(
+        optimizer,
         student=SimpleQA(),
         trainset=training_examples
     )
@@ -98,8 +174,6 @@ def demonstrate_optimization():
 
 
 if __name__ == "__main__":
-    from config import configure_llm
-    
     # Configure LLM
     configure_llm()
     
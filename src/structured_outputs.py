@@ -10,204 +10,408 @@ For older versions, use dspy.asyncify() or asyncio.to_thread().
 """
 
 import asyncio
+import functools
+import itertools
+import logging
+import re
 import dspy
-from pydantic import BaseModel, Field
-from typing import List
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List, Optional, Union
 
+try:
+    from src.config import configure_llm
+    from src.dspy_cache import ResponseCache, SemanticCache
+except ImportError:  # Run as a script from inside src/
+    from config import configure_llm
+    from dspy_cache import ResponseCache, SemanticCache
+
+logger = logging.getLogger(__name__)
+
+
+def _keyword_pattern(keywords: frozenset) -> "re.Pattern[str]":
+    """Compile a case-insensitive substring matcher for a set of keywords."""
+    return re.compile("|".join(map(re.escape, sorted(keywords))), re.IGNORECASE)
+
+
+# Keywords used to infer entity types, compiled once at import
+_ORG_KEYWORDS = frozenset({"inc", "corp", "company", "llc", "organization"})
+_TECH_KEYWORDS = frozenset(
+    {"framework", "library", "api", "programming", "code", "schema", "system"}
+)
+_CONCEPT_KEYWORDS = frozenset({"optimization", "execution", "process", "method"})
+
+_ORG_RE = _keyword_pattern(_ORG_KEYWORDS)
+_TECH_RE = _keyword_pattern(_TECH_KEYWORDS)
+_CONCEPT_RE = _keyword_pattern(_CONCEPT_KEYWORDS)
+
+
+@functools.lru_cache(maxsize=1024)
+def _classify_entity(entity: str) -> str:
+    """Infer an entity's type from common patterns."""
+    if _ORG_RE.search(entity):
+        return "Organization"
+    if _TECH_RE.search(entity):
+        return "Technology"
+    if _CONCEPT_RE.search(entity):
+        return "Concept"
+    if entity[0].isupper() and len(entity.split()) == 2:
+        # Likely a person's name (two capitalized words)
+        return "Person"
+    return "Other"
+
+
+# Entities kept per extraction (limited for the demo)
+MAX_ENTITIES = 5
+
+# Confidence scores for verbal answers, checked before numeric parsing
+_CONFIDENCE_LEVELS = {"very high": 0.9, "high": 0.9, "medium": 0.7, "low": 0.5}
 
-class SummaryOutput(BaseModel):
+
+class StructuredOutput(BaseModel):
+    """Base class for the structured outputs returned by the async modules."""
+
+    # Results are immutable and schema-exact once built
+    model_config = ConfigDict(frozen=True, extra="forbid")
+
+    def to_json(self) -> str:
+        """Serialize to JSON directly with pydantic-core, skipping the dict step."""
+        return self.model_dump_json(exclude_none=True)
+
+    def to_json_bytes(self) -> bytes:
+        """Serialize straight to UTF-8 JSON bytes for HTTP responses.
+
+        Hand the bytes to a plain Response so the framework neither re-validates
+        nor re-encodes the model, e.g. in FastAPI:
+
+            @app.post("/summarize", response_model=None)
+            async def summarize(doc: Document) -> Response:
+                out = await summarizer.aforward(doc.text)
+                return Response(content=out.to_json_bytes(), media_type="application/json")
+        """
+        return self.__pydantic_serializer__.to_json(self, exclude_none=True)
+
+    @classmethod
+    def from_json(cls, data: Union[str, bytes]):
+        """Parse and validate JSON in one pydantic-core pass, skipping json.loads."""
+        return cls.model_validate_json(data)
+
+
+class SummaryOutput(StructuredOutput):
     """Structured output for document summaries."""
 
     summary: str = Field(description="A concise summary of the document")
     word_count: int = Field(description="Number of words in the summary")
 
 
-class EntitiesOutput(BaseModel):
+class EntitiesOutput(StructuredOutput):
     """Structured output for entity extraction."""
 
     entities: List[str] = Field(description="List of named entities found")
     entity_types: List[str] = Field(description="Types of entities (person, org, etc)")
 
 
-class ClassificationOutput(BaseModel):
+class ClassificationOutput(StructuredOutput):
     """Structured output for document classification."""
 
     label: str = Field(description="Document category")
     confidence: float = Field(description="Confidence score between 0 and 1")
 
 
+class SummarizeDocument(dspy.Signature):
+    """Summarize a document concisely."""
+
+    document: str = dspy.InputField()
+    summary: str = dspy.OutputField()
+
+
+class SummarizeDocuments(dspy.Signature):
+    """Summarize each document, returning one summary per document in order."""
+
+    documents: List[str] = dspy.InputField()
+    summaries: List[str] = dspy.OutputField()
+
+
+class ExtractEntities(dspy.Signature):
+    """List the named entities mentioned in a text."""
+
+    text: str = dspy.InputField()
+    entities: str = dspy.OutputField()
+
+
+class ClassifyDocument(dspy.Signature):
+    """Classify a document into a category with a confidence score."""
+
+    document: str = dspy.InputField()
+    category: str = dspy.OutputField()
+    confidence_score: str = dspy.OutputField()
+
+
+class ClassifyDocuments(dspy.Signature):
+    """Classify each document, returning one category and score per document in order."""
+
+    documents: List[str] = dspy.InputField()
+    categories: List[str] = dspy.OutputField()
+    confidence_scores: List[str] = dspy.OutputField()
+
+
 class AsyncSummarizer(dspy.Module):
     """Async summarization with structured output."""
 
-    def __init__(self):
+    def __init__(self, semantic_cache: Optional[SemanticCache] = None):
         super().__init__()
-        self.predict = dspy.Predict("document -> summary")
+        self.predict = dspy.Predict(SummarizeDocument)
+        # Summarizes several documents in one request
+        self.predict_batch = dspy.Predict(SummarizeDocuments)
+        # Repeat inputs are answered from memory instead of another LLM call
+        self._cache = ResponseCache()
+        self.semantic_cache = semantic_cache
 
     async def aforward(self, document: str) -> SummaryOutput:
         """Return a structured summary of the input document."""
         # Use native async support with acall()
-        result = await self.predict.acall(document=document)
+        result = await self._cache.acall(
+            self.predict, semantic_cache=self.semantic_cache, document=document
+        )
+        return self._parse(result.summary)
+
+    async def aforward_batch(
+        self, documents: List[str]
+    ) -> List[Union[SummaryOutput, Exception]]:
+        """Summarize several documents with a single LLM call.
+
+        Falls back to concurrent per-document calls if the batch reply cannot be
+        parsed or does not hold exactly one summary per document; failures are
+        then returned in place. With a semantic cache set, documents always go
+        through aforward() so each one can be answered from it.
+        """
+        if not documents:
+            return []
+
+        if self.semantic_cache is None:
+            try:
+                result = await self._cache.acall(self.predict_batch, documents=documents)
+            except Exception as e:
+                logger.debug("Batch summarization failed, summarizing one by one: %s", e)
+            else:
+                if len(result.summaries) == len(documents):
+                    return [self._parse(summary) for summary in result.summaries]
+
+        return await asyncio.gather(
+            *(self.aforward(document) for document in documents),
+            return_exceptions=True,
+        )
 
+    @staticmethod
+    def _parse(summary) -> SummaryOutput:
+        """Turn a raw LLM summary into a SummaryOutput."""
         # Parse result into structured output
         # IMPORTANT: This manual parsing is a PLACEHOLDER for demonstration purposes.
         # In production DSPy, TypedPredictors would handle this automatically,
         # providing type-safe parsing and validation without manual string manipulation.
-        summary_text = str(result.summary)
+        summary_text = str(summary)
         word_count = len(summary_text.split())
 
-        return SummaryOutput(summary=summary_text, word_count=word_count)
+        # Trusted internal data — validation done by our parser
+        return SummaryOutput.model_construct(summary=summary_text, word_count=word_count)
 
 
 class AsyncEntityExtractor(dspy.Module):
     """Async entity extraction with structured output."""
 
-    def __init__(self):
+    def __init__(self, semantic_cache: Optional[SemanticCache] = None):
         super().__init__()
-        self.predict = dspy.Predict("text -> entities")
+        self.predict = dspy.Predict(ExtractEntities)
+        self._cache = ResponseCache()
+        self.semantic_cache = semantic_cache
 
     async def aforward(self, text: str) -> EntitiesOutput:
         """Extract named entities with their types."""
-        result = await self.predict.acall(text=text)
+        result = await self._cache.acall(
+            self.predict, semantic_cache=self.semantic_cache, text=text
+        )
 
         # Show what the LLM returned
-        print(f"    Entity extraction LLM result: {result.entities}")
+        logger.debug("Entity extraction LLM result: %s", result.entities)
 
         # Parse the result
         # IMPORTANT: The following manual parsing logic is a TEMPORARY PLACEHOLDER.
         # In production, TypedPredictors would handle all parsing and validation automatically.
         # DO NOT build complex parsing logic on top of this demonstration code.
         entities_str = str(result.entities)
-        # Simple parsing - split by common delimiters
-        entities = [e.strip() for e in entities_str.replace(",", ";").split(";") if e.strip()]
-        
+        # Simple parsing - split by common delimiters, stopping once we have enough
+        parts = (e.strip() for e in entities_str.replace(",", ";").split(";"))
+        entities = list(itertools.islice(filter(None, parts), MAX_ENTITIES))
+
         # Infer entity types based on common patterns
-        entity_types = []
-        for entity in entities:
-            entity_lower = entity.lower()
-            if any(word in entity_lower for word in ["inc", "corp", "company", "llc", "organization"]):
-                entity_types.append("Organization")
-            elif any(word in entity_lower for word in ["framework", "library", "api", "programming", "code", "schema", "system"]):
-                entity_types.append("Technology")
-            elif any(word in entity_lower for word in ["optimization", "execution", "process", "method"]):
-                entity_types.append("Concept")
-            elif entity[0].isupper() and len(entity.split()) == 2 and not any(tech in entity_lower for tech in ["programming", "code", "api"]):
-                # Likely a person's name (two capitalized words)
-                entity_types.append("Person")
-            else:
-                entity_types.append("Other")
+        entity_types = [_classify_entity(entity) for entity in entities]
 
-        return EntitiesOutput(entities=entities[:5], entity_types=entity_types[:5])  # Limit to 5 for demo
+        # Trusted internal data — validation done by our parser
+        return EntitiesOutput.model_construct(entities=entities, entity_types=entity_types)
 
 
 class AsyncClassifier(dspy.Module):
     """Async document classification with confidence scores."""
 
-    def __init__(self):
+    def __init__(self, semantic_cache: Optional[SemanticCache] = None):
         super().__init__()
-        self.predict = dspy.Predict("document -> category, confidence_score")
+        self.predict = dspy.Predict(ClassifyDocument)
+        self.predict_batch = dspy.Predict(ClassifyDocuments)
+        self._cache = ResponseCache()
+        self.semantic_cache = semantic_cache
 
     async def aforward(self, document: str) -> ClassificationOutput:
         """Classify the document with confidence score."""
-        result = await self.predict.acall(document=document)
+        result = await self._cache.acall(
+            self.predict, semantic_cache=self.semantic_cache, document=document
+        )
+        return self._parse(result.category, result.confidence_score)
+
+    async def aforward_batch(
+        self, documents: List[str]
+    ) -> List[Union[ClassificationOutput, Exception]]:
+        """Classify several documents with a single LLM call.
+
+        Falls back to concurrent per-document calls if the batch reply cannot be
+        parsed or does not hold exactly one label and score per document; failures
+        are then returned in place. With a semantic cache set, documents always go
+        through aforward() so each one can be answered from it.
+        """
+        if not documents:
+            return []
+
+        if self.semantic_cache is None:
+            try:
+                result = await self._cache.acall(self.predict_batch, documents=documents)
+            except Exception as e:
+                logger.debug("Batch classification failed, classifying one by one: %s", e)
+            else:
+                if len(result.categories) == len(result.confidence_scores) == len(documents):
+                    return [
+                        self._parse(category, confidence_score)
+                        for category, confidence_score in zip(
+                            result.categories, result.confidence_scores
+                        )
+                    ]
+
+        return await asyncio.gather(
+            *(self.aforward(document) for document in documents),
+            return_exceptions=True,
+        )
 
+    @staticmethod
+    def _parse(category, confidence_score) -> ClassificationOutput:
+        """Turn a raw LLM category and confidence into a ClassificationOutput."""
         # Show what the LLM returned
-        print(f"    Classification LLM result: category={result.category}, confidence={result.confidence_score}")
+        logger.debug(
+            "Classification LLM result: category=%s, confidence=%s", category, confidence_score
+        )
 
         # Parse the confidence score
         # NOTE: This manual confidence parsing is a PLACEHOLDER demonstration.
         # TypedPredictors in production would ensure properly formatted, validated outputs.
         try:
             # Handle various confidence formats (0.95, 95%, "high", etc.)
-            confidence_str = str(result.confidence_score).strip()
-            if confidence_str.endswith('%'):
-                confidence = float(confidence_str.rstrip('%')) / 100
-            elif confidence_str.lower() in ['high', 'very high']:
-                confidence = 0.9
-            elif confidence_str.lower() == 'medium':
-                confidence = 0.7
-            elif confidence_str.lower() == 'low':
-                confidence = 0.5
-            else:
-                confidence = float(confidence_str)
-                if confidence > 1:  # If given as percentage without %
-                    confidence = confidence / 100
+            confidence_str = str(confidence_score).strip()
+            confidence = _CONFIDENCE_LEVELS.get(confidence_str.lower())
+            if confidence is None:
+                if confidence_str.endswith('%'):
+                    confidence = float(confidence_str.rstrip('%')) / 100
+                else:
+                    confidence = float(confidence_str)
+                    if confidence > 1:  # If given as percentage without %
+                        confidence = confidence / 100
         except (ValueError, AttributeError):
             confidence = 0.8  # Default confidence if parsing fails
 
-        return ClassificationOutput(label=str(result.category).strip(), confidence=confidence)
+        # Trusted internal data — validation done by our parser
+        return ClassificationOutput.model_construct(label=str(category).strip(), confidence=confidence)
 
 
-async def demonstrate_structured_outputs():
-    """Demonstrate async modules with structured outputs."""
-    print("Async Execution with Structured Outputs:")
-    print("-" * 50)
-
-    # Sample documents
-    technical_doc = """
-    DSPy provides a revolutionary approach to AI programming by replacing 
-    fragile prompts with modular Python code. It supports async execution,
-    structured outputs via Pydantic schemas, and automatic optimization.
-    """
-
-    business_doc = """
-    Our Q3 earnings exceeded expectations with revenue growth of 15%.
-    The company expanded into new markets and increased market share.
-    Customer satisfaction scores reached an all-time high.
-    """
-
-    # Async summarization
+async def _summarization_report(documents: List[str]) -> str:
+    """Summarize the documents and format the demo section."""
     summarizer = AsyncSummarizer()
-    print("\n1. Async Summarization with Word Count:")
+    lines = ["\n1. Async Summarization with Word Count:"]
 
     try:
-        # Process multiple documents concurrently
-        summaries = await asyncio.gather(
-            summarizer.aforward(technical_doc), 
-            summarizer.aforward(business_doc),
-            return_exceptions=True  # Handle partial failures gracefully
-        )
+        # Summarize all documents in a single LLM call
+        summaries = await summarizer.aforward_batch(documents)
 
-        for i, (doc, summary) in enumerate(zip([technical_doc, business_doc], summaries)):
+        for i, summary in enumerate(summaries):
             if isinstance(summary, Exception):
-                print(f"\nDocument {i+1} Error: {summary}")
+                lines.append(f"\nDocument {i+1} Error: {summary}")
             else:
-                print(f"\nDocument {i+1} Summary:")
-                print(f"  Summary: {summary.summary}")
-                print(f"  Word count: {summary.word_count}")
+                lines.append(f"\nDocument {i+1} Summary:")
+                lines.append(f"  Summary: {summary.summary}")
+                lines.append(f"  Word count: {summary.word_count}")
     except Exception as e:
-        print(f"Error in summarization: {e}")
+        lines.append(f"Error in summarization: {e}")
+
+    return "\n".join(lines)
+
 
-    # Entity extraction
+async def _entity_report(document: str) -> str:
+    """Extract entities from the document and format the demo section."""
     extractor = AsyncEntityExtractor()
-    print("\n\n2. Entity Extraction with Types:")
+    lines = ["\n\n2. Entity Extraction with Types:"]
 
     try:
-        entities = await extractor.aforward(technical_doc)
-        print(f"Entities found: {', '.join(entities.entities)}")
-        print(f"Entity types: {', '.join(entities.entity_types)}")
+        entities = await extractor.aforward(document)
+        lines.append(f"Entities found: {', '.join(entities.entities)}")
+        lines.append(f"Entity types: {', '.join(entities.entity_types)}")
     except Exception as e:
-        print(f"Error in entity extraction: {e}")
+        lines.append(f"Error in entity extraction: {e}")
 
-    # Classification
+    return "\n".join(lines)
+
+
+async def _classification_report(documents: List[str], names: List[str]) -> str:
+    """Classify the documents and format the demo section."""
     classifier = AsyncClassifier()
-    print("\n\n3. Document Classification with Confidence:")
+    lines = ["\n\n3. Document Classification with Confidence:"]
 
     try:
-        results = await asyncio.gather(
-            classifier.aforward(technical_doc), 
-            classifier.aforward(business_doc),
-            return_exceptions=True
-        )
+        results = await classifier.aforward_batch(documents)
 
-        for i, (doc_snippet, result) in enumerate(zip(["technical", "business"], results)):
+        for doc_snippet, result in zip(names, results):
             if isinstance(result, Exception):
-                print(f"\n{doc_snippet.capitalize()} document error: {result}")
+                lines.append(f"\n{doc_snippet.capitalize()} document error: {result}")
             else:
-                print(f"\n{doc_snippet.capitalize()} document:")
-                print(f"  Classification: {result.label}")
-                print(f"  Confidence: {result.confidence:.2%}")
+                lines.append(f"\n{doc_snippet.capitalize()} document:")
+                lines.append(f"  Classification: {result.label}")
+                lines.append(f"  Confidence: {result.confidence:.2%}")
     except Exception as e:
-        print(f"Error in classification: {e}")
+        lines.append(f"Error in classification: {e}")
+
+    return "\n".join(lines)
+
+
+async def demonstrate_structured_outputs():
+    """Demonstrate async modules with structured outputs."""
+    print("Async Execution with Structured Outputs:")
+    print("-" * 50)
+
+    # Sample documents
+    technical_doc = """
+    DSPy provides a revolutionary approach to AI programming by replacing 
+    fragile prompts with modular Python code. It supports async execution,
+    structured outputs via Pydantic schemas, and automatic optimization.
+    """
+
+    business_doc = """
+    Our Q3 earnings exceeded expectations with revenue growth of 15%.
+    The company expanded into new markets and increased market share.
+    Customer satisfaction scores reached an all-time high.
+    """
+
+    # The three analyses are independent: run them concurrently, then print the
+    # sections in their numbered order
+    reports = await asyncio.gather(
+        _summarization_report([technical_doc, business_doc]),
+        _entity_report(technical_doc),
+        _classification_report([technical_doc, business_doc], ["technical", "business"]),
+    )
+    for report in reports:
+        print(report)
 
     print("\n✓ Async execution enables concurrent processing")
     print("✓ Structured outputs ensure reliable, validated responses")
@@ -215,8 +419,6 @@ async def demonstrate_structured_outputs():
 
 
 if __name__ == "__main__":
-    from config import configure_llm
-    
     # Configure LLM
     configure_llm()
     
@@ -2,13 +2,20 @@
 
 import pytest
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import dspy
+from dspy.utils import DummyLM
+from pydantic import ValidationError
 from src.basic_examples import SimpleQA, Summarize
+from src.dspy_cache import ResponseCache
+from src.optimization import answer_quality_metric, load_or_compile
 from src.structured_outputs import (
     AsyncSummarizer,
     AsyncEntityExtractor,
     SummaryOutput,
     EntitiesOutput,
     ClassificationOutput,
+    _classify_entity,
 )
 
 
@@ -46,6 +53,48 @@ class TestStructuredOutputs:
         assert hasattr(extractor, "aforward")
         assert asyncio.iscoroutinefunction(extractor.aforward)
 
+    @pytest.mark.asyncio
+    async def test_summarizer_batch_uses_one_call(self):
+        """Test aforward_batch summarizes all documents in a single LLM call."""
+        lm = DummyLM([{"summaries": '["First summary", "Second one here"]'}])
+        with dspy.context(lm=lm):
+            summaries = await AsyncSummarizer().aforward_batch(["doc one", "doc two"])
+
+        assert len(lm.history) == 1
+        assert [s.summary for s in summaries] == ["First summary", "Second one here"]
+        assert [s.word_count for s in summaries] == [2, 3]
+
+    @pytest.mark.asyncio
+    async def test_summarizer_batch_falls_back_on_count_mismatch(self):
+        """Test aforward_batch retries per document if the batch reply is short."""
+        lm = DummyLM(
+            [{"summaries": '["Only one"]'}, {"summary": "First"}, {"summary": "Second"}]
+        )
+        with dspy.context(lm=lm):
+            summaries = await AsyncSummarizer().aforward_batch(["doc one", "doc two"])
+
+        assert len(summaries) == 2
+        assert len(lm.history) == 3
+
+    @pytest.mark.asyncio
+    async def test_summarizer_batch_falls_back_on_parse_error(self):
+        """Test aforward_batch retries per document if the batch reply is unparseable."""
+        # Prose instead of a list fails ChatAdapter and its JSONAdapter retry
+        prose = {"summaries": "Here are the summaries you asked for."}
+        lm = DummyLM([prose, prose, {"summary": "First"}, {"summary": "Second"}])
+        with dspy.context(lm=lm):
+            summaries = await AsyncSummarizer().aforward_batch(["doc one", "doc two"])
+
+        assert [s.summary for s in summaries] == ["First", "Second"]
+
+    def test_entity_type_inference(self):
+        """Test entity types are inferred from keyword patterns."""
+        assert _classify_entity("Acme Inc") == "Organization"
+        assert _classify_entity("DSPy Framework") == "Technology"
+        assert _classify_entity("Prompt optimization") == "Concept"
+        assert _classify_entity("Ada Lovelace") == "Person"
+        assert _classify_entity("Paris") == "Other"
+
     def test_output_schemas_are_valid(self):
         """Test Pydantic schemas are properly defined."""
         # Test SummaryOutput
@@ -65,6 +114,237 @@ class TestStructuredOutputs:
         assert classification.label == "technical"
         assert 0 <= classification.confidence <= 1
 
+    def test_outputs_are_frozen_and_strict(self):
+        """Test structured outputs reject mutation and unknown fields."""
+        summary = SummaryOutput(summary="Test summary", word_count=2)
+        with pytest.raises(ValidationError):
+            summary.word_count = 3
+        with pytest.raises(ValidationError):
+            SummaryOutput(summary="Test summary", word_count=2, extra="nope")
+
+    def test_outputs_serialize_to_json(self):
+        """Test structured outputs serialize to JSON that round-trips."""
+        summary = SummaryOutput(summary="Test summary", word_count=2)
+        assert SummaryOutput.from_json(summary.to_json()) == summary
+
+    def test_outputs_serialize_to_json_bytes(self):
+        """Test to_json_bytes matches to_json, encoded as UTF-8."""
+        summary = SummaryOutput(summary="Résumé of the test", word_count=3)
+        assert summary.to_json_bytes() == summary.to_json().encode("utf-8")
+        assert SummaryOutput.from_json(summary.to_json_bytes()) == summary
+
+    def test_from_json_validates(self):
+        """Test from_json rejects payloads that do not match the schema."""
+        with pytest.raises(ValidationError):
+            ClassificationOutput.from_json('{"label": "technical", "confidence": "n/a"}')
+
+
+class CountingPredict:
+    """Stand-in predictor that counts LLM calls instead of making them."""
+
+    def __init__(self, signature="document -> summary"):
+        self.signature = dspy.Signature(signature)
+        self.demos = []
+        self.calls = 0
+
+    async def acall(self, **kwargs):
+        self.calls += 1
+        await asyncio.sleep(0)
+        return dspy.Prediction(summary=f"summary {self.calls}")
+
+
+class TestResponseCache:
+    """Test the exact-match predictor cache."""
+
+    @pytest.mark.asyncio
+    async def test_repeat_inputs_hit_cache(self):
+        """Test identical (after normalization) inputs reuse one LLM call."""
+        cache = ResponseCache()
+        predict = CountingPredict()
+        first = await cache.acall(predict, document="Same text")
+        second = await cache.acall(predict, document="  Same text\n")
+
+        assert predict.calls == 1
+        assert first is second
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_share_one_call(self):
+        """Test concurrent identical requests are coalesced."""
+        cache = ResponseCache()
+        predict = CountingPredict()
+        results = await asyncio.gather(
+            *(cache.acall(predict, document="Same text") for _ in range(5))
+        )
+
+        assert predict.calls == 1
+        assert all(result is results[0] for result in results)
+
+    @pytest.mark.asyncio
+    async def test_concurrent_duplicates_coalesce_across_caches(self):
+        """Test identical in-flight requests from separate modules share one call."""
+        predict = CountingPredict()
+        first, second = await asyncio.gather(
+            ResponseCache().acall(predict, document="Same text"),
+            ResponseCache().acall(predict, document="Same text"),
+        )
+
+        assert predict.calls == 1
+        assert first is second
+
+    @pytest.mark.asyncio
+    async def test_cancelled_caller_does_not_cancel_shared_request(self):
+        """Test a waiter still gets the result if the caller that started it is cancelled."""
+        predict = CountingPredict()
+        first = asyncio.create_task(ResponseCache().acall(predict, document="Same text"))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(ResponseCache().acall(predict, document="Same text"))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        result = await second
+
+        assert first.cancelled()
+        assert result.summary == "summary 1"
+        assert predict.calls == 1
+
+    def test_requests_on_separate_event_loops_are_not_shared(self):
+        """Test identical requests from threads with their own loops each complete."""
+
+        class SlowPredict(CountingPredict):
+            async def acall(self, **kwargs):
+                await asyncio.sleep(0.05)
+                return await super().acall(**kwargs)
+
+        predict = SlowPredict()
+
+        def run_in_own_loop():
+            return asyncio.run(ResponseCache().acall(predict, document="Same text"))
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            results = list(pool.map(lambda _: run_in_own_loop(), range(2)))
+
+        assert predict.calls == 2
+        assert len(results) == 2
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_under_different_lms_are_not_coalesced(self):
+        """Test in-flight requests are only shared between callers using the same LM."""
+        lm_a = DummyLM([{"summary": "A2"}])
+        lm_b = DummyLM([{"summary": "B2"}])
+        lm_b.model = "dummy-b"
+
+        async def summarize(lm):
+            with dspy.context(lm=lm):
+                return await AsyncSummarizer().aforward("Same text")
+
+        results = await asyncio.gather(summarize(lm_a), summarize(lm_b))
+
+        assert [r.summary for r in results] == ["A2", "B2"]
+
+    @pytest.mark.asyncio
+    async def test_cache_is_keyed_on_active_lm(self):
+        """Test the same input under a different LM is not served from cache."""
+        lm_a = DummyLM([{"summary": "from model A"}])
+        lm_b = DummyLM([{"summary": "from model B"}])
+        lm_b.model = "dummy-b"
+        summarizer = AsyncSummarizer()
+
+        with dspy.context(lm=lm_a):
+            first = await summarizer.aforward("Same text")
+        with dspy.context(lm=lm_b):
+            second = await summarizer.aforward("Same text")
+
+        assert first.summary == "from model A"
+        assert second.summary == "from model B"
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_is_recorded_in_trace(self):
+        """Test a cached result still adds a trace entry for optimizers."""
+        cache = ResponseCache()
+        predict = CountingPredict()
+        await cache.acall(predict, document="Same text")
+
+        with dspy.context(trace=[]):
+            result = await cache.acall(predict, document="Same text")
+            trace = dspy.settings.trace
+
+        assert predict.calls == 1
+        assert trace == [(predict, {"document": "Same text"}, result)]
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self):
+        """Test the least recently used entry is evicted when full."""
+        cache = ResponseCache(maxsize=1)
+        predict = CountingPredict()
+        await cache.acall(predict, document="a")
+        await cache.acall(predict, document="b")
+        await cache.acall(predict, document="a")
+
+        assert predict.calls == 3
+
+
+class CaseInsensitiveCache:
+    """Stand-in semantic cache that treats inputs differing only in case as similar."""
+
+    def __init__(self):
+        self.entries = {}
+        self.lookups = 0
+
+    async def lookup(self, text, scope):
+        self.lookups += 1
+        return self.entries.get((scope, text.casefold()))
+
+    async def store(self, text, scope, prediction):
+        self.entries[(scope, text.casefold())] = prediction
+
+
+class TestSemanticCache:
+    """Test the optional semantic cache hook."""
+
+    @pytest.mark.asyncio
+    async def test_semantic_cache_hit_skips_llm(self):
+        """Test a semantic cache hit is returned without calling the predictor."""
+        summarizer = AsyncSummarizer(semantic_cache=CaseInsensitiveCache())
+        summarizer.predict = CountingPredict()
+
+        first = await summarizer.aforward("Q3 earnings beat expectations")
+        with dspy.context(trace=[]):
+            second = await summarizer.acall(document="q3 EARNINGS beat expectations")
+            trace = dspy.settings.trace
+
+        assert summarizer.predict.calls == 1
+        assert first == second
+        assert len(trace) == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_consults_semantic_cache_per_document(self):
+        """Test aforward_batch looks up and fills the semantic cache for each document."""
+        cache = CaseInsensitiveCache()
+        summarizer = AsyncSummarizer(semantic_cache=cache)
+        summarizer.predict = CountingPredict()
+
+        await summarizer.aforward_batch(["Doc one", "Doc two"])
+        await summarizer.aforward_batch(["doc ONE", "doc TWO"])
+
+        assert summarizer.predict.calls == 2
+        assert cache.lookups == 4
+
+    @pytest.mark.asyncio
+    async def test_semantic_cache_is_scoped_to_lm(self):
+        """Test a prediction made under one LM is not served under another."""
+        lm_a = DummyLM([{"summary": "from model A"}])
+        lm_b = DummyLM([{"summary": "from model B"}])
+        lm_b.model = "dummy-b"
+        summarizer = AsyncSummarizer(semantic_cache=CaseInsensitiveCache())
+
+        with dspy.context(lm=lm_a):
+            first = await summarizer.aforward("Same text")
+        with dspy.context(lm=lm_b):
+            second = await summarizer.aforward("SAME TEXT")
+
+        assert first.summary == "from model A"
+        assert second.summary == "from model B"
+
 
 class TestPipelines:
     """Test pipeline composition."""
@@ -77,14 +357,158 @@ class TestPipelines:
         email_pipeline = ProcessEmailPipeline()
         assert hasattr(email_pipeline, "aforward")
         assert asyncio.iscoroutinefunction(email_pipeline.aforward)
-        assert hasattr(email_pipeline, "summarize")
-        assert hasattr(email_pipeline, "extract_entities")
+        assert asyncio.iscoroutinefunction(email_pipeline.aforward_batch)
+        assert hasattr(email_pipeline, "triage")
+        assert hasattr(email_pipeline, "determine_priority")
 
         # Code pipeline
         code_pipeline = CodeAnalysisPipeline()
         assert hasattr(code_pipeline, "forward")
         assert hasattr(code_pipeline, "understand")
-        assert hasattr(code_pipeline, "find_issues")
+        assert hasattr(code_pipeline, "analyze")
+
+    def test_pipeline_outputs_serialize_to_json(self):
+        """Test pipeline outputs serialize to JSON that round-trips."""
+        from src.pipelines import EmailAnalysisOutput
+
+        output = EmailAnalysisOutput(
+            summary="Crash report",
+            entities=["John Smith"],
+            sentiment="negative",
+            priority="high",
+            suggested_response="Sorry to hear that.",
+        )
+        assert EmailAnalysisOutput.model_validate_json(output.to_json()) == output
+
+    @pytest.mark.asyncio
+    async def test_email_batch_returns_results_and_failures_in_place(self):
+        """Test aforward_batch returns one result per email, with failures in place."""
+        from src.pipelines import ProcessEmailPipeline
+
+        # Each answer is keyed on text that only appears in its stage's prompt;
+        # the second email matches nothing, so every stage for it fails to parse
+        lm = DummyLM(
+            {
+                "P1-urgent": {"response": "Sorry about the crashes."},
+                "Crash report email": {
+                    "summary": "App keeps crashing",
+                    "entities": '["John Smith", "Order 12345"]',
+                    "sentiment": "negative",
+                },
+                "App keeps crashing": {"priority": "P1-urgent"},
+            }
+        )
+        with dspy.context(lm=lm):
+            results = await ProcessEmailPipeline().aforward_batch(
+                ["Crash report email from John Smith", "Unrelated message"]
+            )
+
+        assert len(results) == 2
+        assert results[0].entities == ["John Smith", "Order 12345"]
+        assert results[0].priority == "P1-urgent"
+        assert results[0].suggested_response == "Sorry about the crashes."
+        assert isinstance(results[1], Exception)
+
+    @pytest.mark.asyncio
+    async def test_email_triage_returns_entities_as_list(self):
+        """Test the typed triage signature parses entities into a list."""
+        from src.pipelines import ProcessEmailPipeline
+
+        lm = DummyLM(
+            [{"summary": "Refund request", "entities": '["Jane Doe"]', "sentiment": "negative"}]
+        )
+        with dspy.context(lm=lm):
+            result = await ProcessEmailPipeline().triage.acall(email="Refund please")
+
+        assert result.entities == ["Jane Doe"]
+
+    def test_code_pipeline_forward_returns_all_fields(self):
+        """Test calling the code pipeline synchronously runs both stages via forward."""
+        from src.pipelines import CodeAnalysisPipeline, CodeAnalysisOutput
+
+        lm = DummyLM(
+            [
+                {"description": "Averages a list of numbers"},
+                {
+                    "reasoning": "An empty list divides by zero.",
+                    "issues": "ZeroDivisionError on empty input",
+                    "suggestions": "Return 0 for an empty list",
+                    "tests": "assert calculate_average([]) == 0",
+                },
+            ]
+        )
+        with dspy.context(lm=lm):
+            analysis = CodeAnalysisPipeline()(code="def calculate_average(numbers): ...")
+
+        assert isinstance(analysis, CodeAnalysisOutput)
+        assert analysis.description == "Averages a list of numbers"
+        assert analysis.issues == "ZeroDivisionError on empty input"
+        assert analysis.suggestions == "Return 0 for an empty list"
+        assert analysis.tests == "assert calculate_average([]) == 0"
+
+
+class TestOptimization:
+    """Test optimization helpers."""
+
+    def test_answer_quality_metric_length_bands(self):
+        """Test metric scores short, normal, and long answers."""
+
+        def score(words):
+            return answer_quality_metric(None, dspy.Prediction(answer=" ".join(["w"] * words)))
+
+        assert score(4) == 0.0
+        assert score(5) == 1.0
+        assert score(50) == 1.0
+        assert score(51) == 0.5
+        assert score(500) == 0.5
+
+    def test_load_or_compile_reuses_saved_program(self, tmp_path):
+        """Test a compiled program is saved and reused instead of recompiled."""
+        class CountingOptimizer:
+            metric = staticmethod(answer_quality_metric)
+            calls = 0
+
+            def compile(self, student, trainset):
+                self.calls += 1
+                return student
+
+        optimizer = CountingOptimizer()
+        trainset = [dspy.Example(question="What is DSPy?", answer="A framework.")]
+
+        load_or_compile(optimizer, SimpleQA(), trainset, cache_dir=str(tmp_path))
+        load_or_compile(optimizer, SimpleQA(), trainset, cache_dir=str(tmp_path))
+
+        assert optimizer.calls == 1
+        assert len(list(tmp_path.iterdir())) == 1
+
+    def test_load_or_compile_recompiles_for_new_settings_or_lm(self, tmp_path):
+        """Test changed optimizer settings or a different LM do not reuse a saved program."""
+
+        class CountingOptimizer:
+            metric = staticmethod(answer_quality_metric)
+            calls = 0
+
+            def __init__(self, max_rounds=1):
+                self.max_rounds = max_rounds
+
+            def compile(self, student, trainset):
+                self.calls += 1
+                return student
+
+        trainset = [dspy.Example(question="What is DSPy?", answer="A framework.")]
+        lm_b = DummyLM([])
+        lm_b.model = "dummy-b"
+
+        for optimizer, lm in [
+            (CountingOptimizer(max_rounds=1), DummyLM([])),
+            (CountingOptimizer(max_rounds=2), DummyLM([])),
+            (CountingOptimizer(max_rounds=2), lm_b),
+        ]:
+            with dspy.context(lm=lm):
+                load_or_compile(optimizer, SimpleQA(), trainset, cache_dir=str(tmp_path))
+            assert optimizer.calls == 1
+
+        assert len(list(tmp_path.iterdir())) == 3
 
 
 if __name__ == "__main__":